@@ -1,33 +1,75 @@
 import socket
 import struct
 import logging
+import random
 import threading
 import time
-from typing import Callable
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import count
+from typing import Callable, Hashable
 
 
 logger = logging.getLogger(__name__)
 
 
+# Snapshot of the communicator state, can be used for monitoring
+@dataclass
+class CommunicatorStats:
+    connected: bool
+    reconnects: int
+    last_reconnect_time: float | None  # seconds from losing the connection until it was back
+    buffered_frames: int
+    buffered_bytes: int
+    dropped_frames: int  # frames dropped because the buffer was full
+    collapsed_frames: int  # frames replaced by a newer frame of the same signal
+    flushed_frames: int  # buffered frames sent after a reconnect
+
+
 class TCPCommunicator:
     def __init__(
         self,
         remote_host: str,
         remote_port: int,
         on_recv: Callable[[bytes], None],
-        reconnect_interval: int = 5,
+        reconnect_interval: float = 5,
+        reconnect_min_interval: float = 0.01,
+        buffer_max_frames: int = 1000,
+        buffer_max_bytes: int = 1024 * 1024,
+        collapse_key: Callable[[bytes], Hashable] | None = None,
     ):
         # Initialize input parameters
         self.remote_host: str = remote_host
         self.remote_port: int = remote_port
-        self.reconnect_interval: int = reconnect_interval
+        self.reconnect_interval: float = reconnect_interval  # upper limit of the reconnect backoff
+        self.reconnect_min_interval: float = reconnect_min_interval
         self.on_recv: Callable[[bytes], None] = on_recv
 
+        # Frames are buffered while disconnected and sent in one write after reconnecting.
+        # If collapse_key is set, only the latest frame per key is kept (e.g. SOMEIPPackager.signal_key), so stale cyclic data does not flood the link.
+        self.buffer_max_frames: int = buffer_max_frames
+        self.buffer_max_bytes: int = buffer_max_bytes
+        self.collapse_key: Callable[[bytes], Hashable] | None = collapse_key
+        self._buffer: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._buffer_bytes: int = 0
+        self._buffer_seq: count[int] = count()
+
         # initialize socket and threads
         self.sock: socket.socket | None = None
+        self._send_lock: threading.Lock = threading.Lock()  # keeps buffered and new frames in order
         self._stop_event: threading.Event = threading.Event()
         self._receive_thread: threading.Thread | None = None
 
+        # monitoring
+        self._reconnect_attempts: int = 0
+        self._connected_at: float = 0.0
+        self._disconnected_at: float | None = None
+        self._reconnects: int = 0
+        self._last_reconnect_time: float | None = None
+        self._dropped_frames: int = 0
+        self._collapsed_frames: int = 0
+        self._flushed_frames: int = 0
+
         # Start the background management thread immediately
         self._start_receiver()
 
@@ -42,14 +84,26 @@ class TCPCommunicator:
             # Connection successful
             new_sock.settimeout(None)  # Set back to blocking mode for recv
             self.sock = new_sock
+            self._connected_at = time.monotonic()
+            if self._disconnected_at is not None:
+                self._reconnects += 1
+                self._last_reconnect_time = self._connected_at - self._disconnected_at
             logger.info(f"Connected to {self.remote_host}:{self.remote_port}")
             return True
         except (socket.error, ConnectionRefusedError) as e:
-            logger.warning(
-                f"Connection failed to {self.remote_host}:{self.remote_port} ({e}). Retrying in {self.reconnect_interval}s..."
-            )
+            logger.warning(f"Connection failed to {self.remote_host}:{self.remote_port} ({e})")
             return False
 
+    def _backoff(self):
+        # Exponential backoff with jitter, starting at reconnect_min_interval and limited by reconnect_interval
+        delay = min(self.reconnect_interval, self.reconnect_min_interval * 2**self._reconnect_attempts)
+        # Stop counting once the limit is reached, otherwise the exponent grows during long outages until the float conversion overflows
+        if delay < self.reconnect_interval:
+            self._reconnect_attempts += 1
+        delay = random.uniform(delay / 2, delay)
+        logger.debug(f"Retrying in {delay:.3f}s...")
+        _ = self._stop_event.wait(delay)
+
     def _start_receiver(self):
         self._stop_event.clear()
         self._receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
@@ -59,8 +113,9 @@ class TCPCommunicator:
         while not self._stop_event.is_set():
             if self.sock is None:
                 if not self._connect():
-                    time.sleep(self.reconnect_interval)
+                    self._backoff()
                     continue
+                self._flush_buffer()
 
             try:
                 # 1. Read 4-byte header
@@ -79,8 +134,11 @@ class TCPCommunicator:
 
             except (ConnectionError, socket.error) as e:
                 logger.error(f"Socket error in receiver: {e}")
+                # Only start the backoff from the beginning if the connection was stable, so a server which accepts and closes right away is not hammered
+                if time.monotonic() - self._connected_at >= self.reconnect_interval:
+                    self._reconnect_attempts = 0
                 self.close_socket()
-                time.sleep(self.reconnect_interval)
+                self._backoff()
 
         logger.info("Receiver thread exiting.")
 
@@ -99,20 +157,84 @@ class TCPCommunicator:
                 return None
         return bytes(data)
 
+    @staticmethod
+    def _frame(payloads: list[bytes]) -> bytes:
+        # Prefix every payload with its length and join them, so they can be sent in a single write
+        return b"".join(struct.pack("!I", len(payload)) + payload for payload in payloads)
+
+    def _enqueue(self, payloads: list[bytes]):
+        # Needs to be called with the send lock held
+        for payload in payloads:
+            if self.collapse_key is not None:
+                key = self.collapse_key(payload)
+                old = self._buffer.pop(key, None)
+                if old is not None:
+                    self._buffer_bytes -= len(old)
+                    self._collapsed_frames += 1
+            else:
+                key = next(self._buffer_seq)
+
+            self._buffer[key] = payload
+            self._buffer_bytes += len(payload)
+
+        # Drop the oldest frames if the buffer is full
+        while self._buffer and (
+            len(self._buffer) > self.buffer_max_frames or self._buffer_bytes > self.buffer_max_bytes
+        ):
+            _, dropped = self._buffer.popitem(last=False)
+            self._buffer_bytes -= len(dropped)
+            self._dropped_frames += 1
+
+    def _flush_buffer(self):
+        with self._send_lock:
+            current_sock = self.sock
+            if not current_sock or not self._buffer:
+                return
+
+            payloads = list(self._buffer.values())
+            try:
+                current_sock.sendall(self._frame(payloads))
+            except Exception as e:
+                # The frames stay in the buffer and are sent after the next reconnect
+                logger.error(f"Flushing buffered frames failed: {e}")
+                self.close_socket()
+                return
+
+            self._buffer.clear()
+            self._buffer_bytes = 0
+            self._flushed_frames += len(payloads)
+            logger.info(f"Flushed {len(payloads)} buffered frames")
+
     def send_packets(self, payloads: list[bytes]):
-        current_sock = self.sock
-        if not current_sock:
-            # Silently skip sending if not connected (avoiding ERROR spam)
+        if not payloads:
             return
 
-        for payload in payloads:
-            length_header = struct.pack("!I", len(payload))
+        with self._send_lock:
+            current_sock = self.sock
+            # Frames are buffered while disconnected. Buffered frames are sent first, so nothing is sent before the flush
+            if not current_sock or self._buffer:
+                self._enqueue(payloads)
+                return
+
             try:
-                current_sock.sendall(length_header + payload)
+                current_sock.sendall(self._frame(payloads))
             except Exception as e:
                 logger.error(f"Send failed: {e}")
                 self.close_socket()
-                break
+                self._enqueue(payloads)
+
+    def stats(self) -> CommunicatorStats:
+        with self._send_lock:
+            return CommunicatorStats(
+                connected=self.sock is not None,
+                reconnects=self._reconnects,
+                last_reconnect_time=self._last_reconnect_time,
+                buffered_frames=len(self._buffer),
+                buffered_bytes=self._buffer_bytes,
+                dropped_frames=self._dropped_frames,
+                collapsed_frames=self._collapsed_frames,
+                flushed_frames=self._flushed_frames,
+            )
 
     def close_socket(self):
         if self.sock:
@@ -121,6 +243,7 @@ class TCPCommunicator:
             except Exception:
                 pass
             self.sock = None
+            self._disconnected_at = time.monotonic()
 
     def close(self):
         self._stop_event.set()
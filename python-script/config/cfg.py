@@ -8,11 +8,15 @@ from config.ecus import ecu_1, ecu_2
 class CmdLineConfig(Tap):
     remote_host: str = "127.0.0.1"
     remote_port: int = 9000
+    interface: str | None = None
+    fleet: str | None = None
 
     @override
     def configure(self):
         self.add_argument("-H", "--remote_host", help="Hostname or IP-Address of the TCP Server")
         self.add_argument("-p", "--remote_port", help="Port of the TCP Server")
+        self.add_argument("-i", "--interface", help="Send directly on this ethernet interface instead of using the TCP Server (requires root)")
+        self.add_argument("-f", "--fleet", help="Load the ECUs from a fleet description (JSON/TOML) instead of config/ecus.py")
 
 
 class Config:
@@ -0,0 +1,277 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tomllib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Final
+
+from config import data as data_module
+from config.base import (
+    ECUConfig,
+    PublisherMethod,
+    PublisherService,
+    ServiceConfig,
+    SubscriberMethod,
+    SubscriberService,
+)
+from config.data import DataObject
+from packager import RecvRegistry, SendRegistry, SOMEIPPackager
+
+
+logger = logging.getLogger(__name__)
+
+
+# NOTE: Fleet description
+# Instead of defining ECUs as python objects (see ecus.py), large fleets (e.g. generated from ARXML/FIBEX exports) can be described in a JSON or TOML file.
+# The payload of every method is described by a struct format string, the fields of the data type are packed/unpacked in their declaration order.
+# See fleet.example.json for a description which is equivalent to the sample config in ecus.py.
+#
+# The compiled fleet is stored next to the description in a cache file. It is only valid for exactly the same description (the sha256 of the file is stored in the header).
+# NOTE: The cache is a pickle, so only load cache files which were created by this script.
+
+
+# Header of the cache file: magic, format version, sha256 of the fleet description
+CACHE_MAGIC: Final[bytes] = b"SIPFLEET"
+CACHE_VERSION: Final[int] = 1
+CACHE_HEADER: Final[struct.Struct] = struct.Struct(">8sH32s")
+
+
+## --- Converters ---
+# The converters need to be picklable to be stored in the cache, so lambdas can not be used here.
+
+
+@dataclass
+class StructPacker:
+    fmt: str
+
+    def __call__(self, data: DataObject) -> bytes:
+        # DataObjects are dataclasses, the fields are packed in their declaration order
+        if not dataclasses.is_dataclass(data) or isinstance(data, type):
+            raise TypeError(f"{type(data).__name__} is not a dataclass instance")
+        return struct.pack(self.fmt, *dataclasses.astuple(data))
+
+
+@dataclass
+class StructUnpacker:
+    fmt: str
+    data_type: type
+
+    def __call__(self, data_bytes: bytes) -> DataObject:
+        size = struct.calcsize(self.fmt)
+        return self.data_type(*struct.unpack(self.fmt, data_bytes[:size]))
+
+
+## --- Loading and Validation ---
+
+
+def _read_description(path: Path, raw: bytes) -> dict[str, Any]:
+    if path.suffix == ".toml":
+        return tomllib.loads(raw.decode())
+    return json.loads(raw)
+
+
+# Reads a required key, so errors in large generated descriptions name the location instead of raising a bare KeyError
+def _require(raw: dict[str, Any], key: str, expected: type, where: str) -> Any:
+    if key not in raw:
+        raise ValueError(f"{where}: missing '{key}'")
+    value = raw[key]
+    # bool is a subclass of int, but true/false is never a valid id
+    if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+        raise ValueError(f"{where}: '{key}' must be {expected.__name__}, got {type(value).__name__}")
+    return value
+
+
+def _resolve_data_type(name: str, where: str) -> type:
+    data_type = getattr(data_module, name, None)
+    # Only dataclasses can be packed and unpacked field by field, this also rejects the DataObject base class
+    if (
+        not isinstance(data_type, type)
+        or not issubclass(data_type, DataObject)
+        or not dataclasses.is_dataclass(data_type)
+    ):
+        raise ValueError(f"{where}: unknown data type '{name}' (must be a DataObject dataclass in config/data.py)")
+    return data_type
+
+
+def _check_format(fmt: str, data_type: type, where: str) -> None:
+    try:
+        item_count = len(struct.unpack(fmt, bytes(struct.calcsize(fmt))))
+    except struct.error as e:
+        raise ValueError(f"{where}: invalid format '{fmt}' ({e})") from e
+
+    field_count = len(dataclasses.fields(data_type))
+    if item_count != field_count:
+        raise ValueError(
+            f"{where}: format '{fmt}' has {item_count} items, but {data_type.__name__} has {field_count} fields"
+        )
+
+
+def _parse_service(ecu_name: str, index: int, raw: dict[str, Any]) -> ServiceConfig:
+    where = f"ECU '{ecu_name}', service #{index}"
+    kind = _require(raw, "kind", str, where)
+    service_id: int = _require(raw, "id", int, where)
+    iface_ver: int = _require(raw, "iface_ver", int, where)
+    where = f"ECU '{ecu_name}', service {service_id:#06x}"
+    methods: dict[type, Any] = {}
+
+    if kind not in ("subscriber", "publisher"):
+        raise ValueError(f"{where}: unknown service kind '{kind}' (expected 'subscriber' or 'publisher')")
+
+    for method_index, raw_method in enumerate(_require(raw, "methods", list, where)):
+        method_where = f"{where}, method #{method_index}"
+        method_id: int = _require(raw_method, "id", int, method_where)
+        data_type = _resolve_data_type(_require(raw_method, "data_type", str, method_where), method_where)
+        fmt: str = _require(raw_method, "format", str, method_where)
+        _check_format(fmt, data_type, method_where)
+
+        if data_type in methods:
+            raise ValueError(f"{where}: data type {data_type.__name__} is configured twice")
+
+        if kind == "subscriber":
+            methods[data_type] = SubscriberMethod[DataObject](method_id, StructPacker(fmt))
+        else:
+            methods[data_type] = PublisherMethod[DataObject](method_id, StructUnpacker(fmt, data_type))
+
+    if kind == "subscriber":
+        return SubscriberService(service_id, iface_ver, methods)
+    return PublisherService(service_id, iface_ver, methods)
+
+
+def _parse_ecu(index: int, raw: dict[str, Any]) -> ECUConfig:
+    name: str = _require(raw, "name", str, f"ECU #{index}")
+    where = f"ECU '{name}'"
+    return ECUConfig(
+        name,
+        _require(raw, "ip", str, where),
+        _require(raw, "mac", str, where),
+        [
+            _parse_service(name, service_index, service)
+            for service_index, service in enumerate(_require(raw, "services", list, where))
+        ],
+    )
+
+
+def validate_fleet(ecus: list[ECUConfig]) -> None:
+    errors: list[str] = []
+    ips: dict[str, str] = {}
+    macs: dict[str, str] = {}
+
+    for ecu in ecus:
+        # IP and MAC addresses need to be unique, otherwise received packets can not be assigned to an ecu
+        if ecu.ip in ips:
+            errors.append(f"IP {ecu.ip} is used by '{ips[ecu.ip]}' and '{ecu.name}'")
+        _ = ips.setdefault(ecu.ip, ecu.name)
+
+        mac = ecu.mac.lower()
+        if mac in macs:
+            errors.append(f"MAC {ecu.mac} is used by '{macs[mac]}' and '{ecu.name}'")
+        _ = macs.setdefault(mac, ecu.name)
+
+        # (service_id, method_id) needs to be unique per ecu
+        keys: set[tuple[int, int]] = set()
+        for service in ecu.services:
+            if not isinstance(service, (SubscriberService, PublisherService)):
+                continue
+            for method in service.methods.values():
+                key = (service.id, method.id)
+                if key in keys:
+                    errors.append(f"ECU '{ecu.name}': duplicate (srv_id, sub_id) ({key[0]:#06x}, {key[1]:#06x})")
+                keys.add(key)
+
+    if errors:
+        raise ValueError("Invalid fleet description:\n" + "\n".join(errors))
+
+
+def _load_fleet(path: Path, raw: bytes) -> list[ECUConfig]:
+    description = _read_description(path, raw)
+    ecus = [_parse_ecu(index, ecu) for index, ecu in enumerate(_require(description, "ecus", list, str(path)))]
+    validate_fleet(ecus)
+    return ecus
+
+
+def load_fleet(path: str | Path) -> list[ECUConfig]:
+    path = Path(path)
+    return _load_fleet(path, path.read_bytes())
+
+
+## --- Compilation Cache ---
+
+
+def cache_path_for(path: str | Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".cache")
+
+
+# The digest is computed from the same bytes that are compiled, so the cache header always matches its contents
+def _compile(path: Path, raw: bytes, digest: bytes, cache_path: Path) -> tuple[SendRegistry, RecvRegistry]:
+    registries = SOMEIPPackager(0, 0, _load_fleet(path, raw)).registries()
+
+    # Write to a temporary file first, so other processes never map a half written cache
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            _ = f.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, digest))
+            pickle.dump(registries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        # The registries are already built, so a missing cache (e.g. read-only directory) only slows down the next start
+        logger.warning(f"Could not write fleet cache {cache_path} ({e}), continuing without cache")
+        try:
+            tmp_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        return registries
+
+    logger.info(f"Compiled fleet description {path} into {cache_path}")
+    return registries
+
+
+def compile_fleet(path: str | Path, cache_path: str | Path | None = None) -> tuple[SendRegistry, RecvRegistry]:
+    path = Path(path)
+    cache_path = Path(cache_path) if cache_path else cache_path_for(path)
+    raw = path.read_bytes()
+    return _compile(path, raw, hashlib.sha256(raw).digest(), cache_path)
+
+
+def _load_cache(cache_path: Path, digest: bytes) -> tuple[SendRegistry, RecvRegistry] | None:
+    try:
+        with open(cache_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < CACHE_HEADER.size:
+                return None
+            magic, version, cached_digest = CACHE_HEADER.unpack_from(mm)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION or cached_digest != digest:
+                return None
+            # The registries are unpickled directly from the mapped pages without copying the file into memory first
+            with memoryview(mm) as view:
+                return pickle.loads(view[CACHE_HEADER.size :])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # Besides a broken file, unpickling also fails if a module or dataclass changed since the cache was compiled
+        logger.warning(f"Could not load fleet cache {cache_path} ({e}), recompiling...")
+        return None
+
+
+# Returns a packager for the fleet description. The compiled cache is used if it is up to date, otherwise it is (re)built.
+def load_fleet_packager(
+    path: str | Path,
+    client_id: int,
+    proto_version: int,
+    cache_path: str | Path | None = None,
+) -> SOMEIPPackager:
+    path = Path(path)
+    cache_path = Path(cache_path) if cache_path else cache_path_for(path)
+    raw = path.read_bytes()
+    digest = hashlib.sha256(raw).digest()
+
+    registries = _load_cache(cache_path, digest)
+    if registries is None:
+        registries = _compile(path, raw, digest, cache_path)
+
+    return SOMEIPPackager.from_registries(client_id, proto_version, registries)
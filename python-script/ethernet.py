@@ -1,130 +1,126 @@
-from collections import defaultdict
-import struct
+import logging
 import socket
-from typing import Final
-from scapy.layers.l2 import Ether
-from scapy.layers.inet import IP, UDP
-from scapy.sendrecv import sendp
-from scapy.main import load_contrib
-
-from config.base import ECUConfig, MethodConfig, ServiceConfig
-from config.cfg import MessageType, RetCode, cfg
-from config.data import DataObject
-
-load_contrib("automotive.someip")
-from scapy.contrib.automotive.someip import SOMEIP
-
-
-# TODO: first send a service discovery message
-# the question is how often this needs to be sent (i guess it is the task of this script and not the remote device)
-
-
-class SOMEIPSessionManager:
-    # Session ID is 16-bit (0x0001 to 0xFFFF)
-    MAX_SESSION_ID: Final[int] = 0xFFFF
-
-    def __init__(self) -> None:
-        # Key: (service_id, method_id), Value: current_session_id
-        self._sessions: dict[tuple[int, int], int] = defaultdict(lambda: 1)
+import threading
+from typing import Callable, Final, Protocol
 
-    def get_next_id(self, service_id: int, method_id: int) -> int:
-        key: tuple[int, int] = (service_id, method_id)
-        current: int = self._sessions[key]
-
-        # Increment and wrap logic
-        # If current is 65535, next is 1
-        self._sessions[key] = (current % self.MAX_SESSION_ID) + 1
-
-        return current
+from config.data import DataObject
+from packager import SOMEIPPackager
+
+
+logger = logging.getLogger(__name__)
+
+
+# Ethertype used to receive every frame on the interface (see linux/if_ether.h)
+ETH_P_ALL: Final[int] = 0x0003
+
+# Largest frame that can be received (same value as MAX_PACKET_SIZE in the tcp-receiver)
+MAX_FRAME_SIZE: Final[int] = 4096
+
+# How often the receiver thread checks if it should stop (recvfrom on a packet socket can not be interrupted by close)
+RECV_TIMEOUT: Final[float] = 0.5
+
+
+# Every transport that accepts a batch of full ethernet frames can be used by the forwarder.
+# TCPCommunicator (communicator.py) and RawEthernetCommunicator (below) both implement this.
+class FrameTransport(Protocol):
+    def send_packets(self, payloads: list[bytes]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+# This Component sends and receives ethernet frames directly on a local interface (e.g. a NIC or a veth pair) using an AF_PACKET raw socket.
+# It has the same interface as the TCPCommunicator, so the tcp-receiver bridge hop can be skipped when the interface is available on this machine.
+# NOTE: Requires root privileges (or CAP_NET_RAW) and only works on linux
+class RawEthernetCommunicator:
+    def __init__(
+        self,
+        interface: str,
+        on_recv: Callable[[bytes], None],
+    ):
+        # Initialize input parameters
+        self.interface: str = interface
+        self.on_recv: Callable[[bytes], None] = on_recv
+
+        # initialize socket and threads
+        self.sock: socket.socket = socket.socket(
+            socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL)
+        )
+        self.sock.bind((self.interface, 0))
+        self.sock.settimeout(RECV_TIMEOUT)
+        logger.info(f"Bound raw socket to interface {self.interface}")
+
+        self._stop_event: threading.Event = threading.Event()
+        self._receive_thread: threading.Thread | None = None
+
+        # Start the background receiver thread immediately
+        self._start_receiver()
+
+    def _start_receiver(self):
+        self._stop_event.clear()
+        self._receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self._receive_thread.start()
+
+    def _receive_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                frame, addr = self.sock.recvfrom(MAX_FRAME_SIZE)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if not self._stop_event.is_set():
+                    logger.error(f"Socket error in receiver: {e}")
+                break
+
+            # A packet socket also sees the frames sent by this process, those are skipped
+            # addr = (ifname, proto, pkttype, hatype, addr)
+            if addr[2] == socket.PACKET_OUTGOING:
+                continue
+
+            # Every frame on the interface is received here (not only SOME/IP), so a frame which can not be handled must not stop the receiver
+            try:
+                self.on_recv(frame)
+            except Exception as e:
+                logger.error(f"Failed to handle received frame: {e}")
+
+        logger.info("Receiver thread exiting.")
+
+    def send_packets(self, payloads: list[bytes]):
+        # The frames are already fully built by the packager, so they are written back to back without any per-frame building
+        for payload in payloads:
+            try:
+                _ = self.sock.send(payload)
+            except OSError as e:
+                logger.error(f"Send failed on {self.interface}: {e}")
+                break
+
+    def close(self):
+        # The receiver thread notices the stop event after at most RECV_TIMEOUT
+        self._stop_event.set()
+        if self._receive_thread:
+            self._receive_thread.join()
+        self.sock.close()
+
+
+# This Component combines the packager with a transport, so DataObjects can directly be forwarded to the configured ECUs.
+# Packets can either be sent over the tcp-receiver bridge (TCPCommunicator) or directly on a local interface (RawEthernetCommunicator).
+class SOMEIPForwarder:
+    def __init__(self, packager: SOMEIPPackager, transport: FrameTransport):
+        self.packager: SOMEIPPackager = packager
+        self.transport: FrameTransport = transport
 
+    def send(self, data: DataObject) -> None:
+        packets = self.packager.package(data)
+        if packets:
+            self.transport.send_packets(packets)
 
-# TODO: separate package builder and forwarder into separate components
+    def send_many(self, data: list[DataObject]) -> None:
+        # Builds all frames first and hands them to the transport as one batch
+        packets: list[bytes] = []
+        for item in data:
+            packets.extend(self.packager.package(item))
 
-class SOMEIPForwarder:
-    def __init__(self, remote_host: str, remote_port: int, client_id: int):
-        self.remote_host: str = remote_host
-        self.remote_port: int = remote_port
-        # self.interface: str = interface
-        self.client_id: int = client_id
-
-        self.sock: socket.socket | None = None
-
-        self.session_manager: SOMEIPSessionManager = SOMEIPSessionManager()
-        self._registry: dict[
-            type, list[tuple[ECUConfig, ServiceConfig, MethodConfig[DataObject]]]
-        ] = {}
-
-        self._connect()
-
-    def register_config(self, ecus: list[ECUConfig]) -> None:
-        for ecu in ecus:
-            for service in ecu.services:
-                for data_type, method in service.methods.items():
-                    if data_type not in self._registry:
-                        self._registry[data_type] = []
-                    self._registry[data_type].append((ecu, service, method))
-
-    def _connect(self):
-        try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.connect((self.remote_host, self.remote_port))
-            print(f"Connected to forwarder at {self.remote_host}:{self.remote_port}")
-        except Exception as e:
-            print(f"Failed to connect: {e}")
-            self.sock = None
+        if packets:
+            self.transport.send_packets(packets)
 
-    def send(self, data: DataObject) -> None:
-        targets = self._registry.get(type(data))
-        if not targets:
-            return
-
-        for ecu, service, method in targets:
-            session_id = self.session_manager.get_next_id(service.id, method.id)
-
-            # Construct SOME/IP Layer
-            sip = SOMEIP(
-                srv_id=service.id,
-                sub_id=method.id,
-                client_id=self.client_id,
-                session_id=session_id,
-                msg_type=MessageType.NOTIFICATION,
-                proto_ver=cfg.proto_ver,
-                iface_ver=service.iface_ver,
-                retcode=RetCode.E_OK,
-            )
-
-            # Build and send full packet
-            pkt = (
-                Ether(dst=ecu.mac)
-                / IP(dst=ecu.ip)
-                / UDP(sport=30490, dport=30490)
-                / sip
-                / method.converter(data)
-            )
-
-            # Send to automotive ethernet directly
-            # sendp(pkt, iface=self.interface, verbose=False)
-
-            raw_payload = bytes(pkt)
-            self._send_over_tcp(raw_payload)
-
-    def _send_over_tcp(self, payload: bytes) -> None:
-        if self.sock is None:
-            print("Socket not connected, attempting reconnect...")
-            self._connect()
-            if self.sock is None:
-                return # Still failed
-        try:
-            # Pack length into 4 bytes, Big Endian (!I)
-            length_header = struct.pack('!I', len(payload))
-
-            # Send Length + Payload
-            self.sock.sendall(length_header + payload)
-
-        except (BrokenPipeError, ConnectionResetError):
-            print("Connection lost. Reconnecting...")
-            self.sock.close()
-            self._connect()
-            if self.sock:
-                # Retry once
-                self.sock.sendall(struct.pack('!I', len(payload)) + payload)
+    def close(self) -> None:
+        self.transport.close()
@@ -1,9 +1,11 @@
 from communicator import TCPCommunicator
+from ethernet import FrameTransport, RawEthernetCommunicator, SOMEIPForwarder
 from packager import SOMEIPPackager
 import time
 import logging
 
 from config.cfg import cfg
+from config.fleet import load_fleet_packager
 from config.data import SpeedData, SteeringAngleData
 
 
@@ -14,26 +16,38 @@ logger = logging.getLogger(__name__)
 # This main function sends sample data (speed and steering angle).
 # It will also receive packets and print their data
 def main():
-    packager = SOMEIPPackager(cfg.client_id, cfg.proto_ver, cfg.ecus)
+    if cfg.cmd.fleet:
+        packager = load_fleet_packager(cfg.cmd.fleet, cfg.client_id, cfg.proto_ver)
+    else:
+        packager = SOMEIPPackager(cfg.client_id, cfg.proto_ver, cfg.ecus)
 
     def receive_callback(data: bytes):
         logger.debug(f"Received message: {data}")
         payload = packager.unpackage(data)
         logger.info(f"Received payload: {payload}")
 
-    communicator = TCPCommunicator(cfg.cmd.remote_host, cfg.cmd.remote_port, receive_callback)
+    # Skip the tcp-receiver and use the interface directly when one is given
+    communicator: FrameTransport
+    if cfg.cmd.interface:
+        communicator = RawEthernetCommunicator(cfg.cmd.interface, receive_callback)
+    else:
+        communicator = TCPCommunicator(
+            cfg.cmd.remote_host,
+            cfg.cmd.remote_port,
+            receive_callback,
+            collapse_key=SOMEIPPackager.signal_key,
+        )
+    forwarder = SOMEIPForwarder(packager, communicator)
 
     while True:
         data_speed = SpeedData(10)
         data_steer = SteeringAngleData(120)
 
-        packages = packager.package(data_speed)
-        communicator.send_packets(packages)
+        forwarder.send(data_speed)
 
         time.sleep(0.5)
 
-        packages = packager.package(data_steer)
-        communicator.send_packets(packages)
+        forwarder.send(data_steer)
 
         time.sleep(1)
 
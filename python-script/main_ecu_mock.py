@@ -1,5 +1,6 @@
 import struct
 from communicator import TCPCommunicator
+from ethernet import FrameTransport, RawEthernetCommunicator, SOMEIPForwarder
 from config.base import ECUConfig, PublisherMethod, PublisherService, SubscriberMethod, SubscriberService
 from packager import SOMEIPPackager
 import time
@@ -65,13 +66,23 @@ def main():
         payload = packager.unpackage(data)
         logger.info(f"Received payload: {payload}")
 
-    communicator = TCPCommunicator(cfg.cmd.remote_host, cfg.cmd.remote_port, receive_callback)
+    # Skip the tcp-receiver and use the interface directly when one is given
+    communicator: FrameTransport
+    if cfg.cmd.interface:
+        communicator = RawEthernetCommunicator(cfg.cmd.interface, receive_callback)
+    else:
+        communicator = TCPCommunicator(
+            cfg.cmd.remote_host,
+            cfg.cmd.remote_port,
+            receive_callback,
+            collapse_key=SOMEIPPackager.signal_key,
+        )
+    forwarder = SOMEIPForwarder(packager, communicator)
 
     while True:
         data = GPSCoordData(10.0, 7.1)
 
-        packages = packager.package(data)
-        communicator.send_packets(packages)
+        forwarder.send(data)
 
         time.sleep(1)
 
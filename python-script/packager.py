@@ -31,6 +31,15 @@ class RetCode(int, enum.Enum):
     E_OK = 0x00
 
 
+# Key: data type, Value: all subscriber methods the data needs to be sent to
+type SendRegistry = dict[
+    type, list[tuple[ECUConfig, ServiceConfig, SubscriberMethod[DataObject]]]
+]
+# Key: (service_id, method_id), Value: all publisher methods the data can be received from
+type RecvRegistry = dict[
+    tuple[int, int], list[tuple[ECUConfig, PublisherService, PublisherMethod[DataObject]]]
+]
+
 
 # This Component manages the session ids and can provide the next available SOME/IP Session ID over a method
 class SOMEIPSessionManager:
@@ -62,18 +71,36 @@ class SOMEIPPackager:
         self.session_manager: SOMEIPSessionManager = SOMEIPSessionManager()
 
         # holds all methods which data needs to be sent
-        self._ecu_send_registry: dict[
-            type, list[tuple[ECUConfig, ServiceConfig, SubscriberMethod[DataObject]]]
-        ] = {}
+        self._ecu_send_registry: SendRegistry = {}
         # holds full ecu config to determine where the message is coming from afterwards
-        self._ecu_recv_registry: dict[
-            tuple[int, int],  # (service_id, method_id)
-            list[
-                tuple[ECUConfig, PublisherService, PublisherMethod[DataObject]]
-            ],
-        ] = {}
+        self._ecu_recv_registry: RecvRegistry = {}
         self.register_config(ecus)
 
+    # Creates a packager from registries which were already built by register_config (e.g. loaded from a compiled fleet cache)
+    @classmethod
+    def from_registries(
+        cls,
+        client_id: int,
+        proto_version: int,
+        registries: tuple[SendRegistry, RecvRegistry],
+    ) -> "SOMEIPPackager":
+        packager = cls(client_id, proto_version, [])
+        packager._ecu_send_registry, packager._ecu_recv_registry = registries
+        return packager
+
+    # Returns the send and receive registries, so they can be stored and reused by from_registries
+    def registries(self) -> tuple[SendRegistry, RecvRegistry]:
+        return self._ecu_send_registry, self._ecu_recv_registry
+
+    # Identifies the signal of a frame built by package() (destination ip, service id and method id).
+    # Used to only keep the latest value of a signal, e.g. in the send buffer of the TCPCommunicator
+    @staticmethod
+    def signal_key(frame: bytes) -> bytes:
+        # Ethernet header is 14 bytes, the ip header length is given in the IHL field, the UDP header is 8 bytes
+        ip_header_len = (frame[14] & 0x0F) * 4
+        someip_offset = 14 + ip_header_len + 8
+        return frame[30:34] + frame[someip_offset : someip_offset + 4]
+
     def register_config(self, ecus: list[ECUConfig]) -> None:
         for ecu in ecus:
             for service in ecu.services: